@@ -21,7 +21,7 @@ from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 # Import our OCR processor
-from ocr_automation_backend import UdderHygieneOCR, DataExporter
+from udder_hygiene_ocr import UdderHygieneOCR, DataExporter, RecordDeduplicator, FormatRegistry
 
 # Configuration
 CONFIG = {
@@ -29,6 +29,8 @@ CONFIG = {
     'PROCESSED_FOLDER': '/path/to/processed',       # Archive folder
     'OUTPUT_FOLDER': '/path/to/output',             # Excel output folder
     'ERROR_FOLDER': '/path/to/errors',              # Failed files
+    'DEDUP_INDEX': '/path/to/dedup_index.sqlite3',  # Index of already-extracted records
+    'FILE_FORMATS': {},                             # Filename pattern -> sheet format, e.g. {'*-quarters.pdf': 'quarters'}
     'EMAIL_SETTINGS': {
         'smtp_server': 'smtp.gmail.com',
         'smtp_port': 587,
@@ -69,31 +71,37 @@ class FileWatcher(FileSystemEventHandler):
         logger.info(f"New file detected: {filepath}")
         
         try:
-            # Process with OCR
-            processor = UdderHygieneOCR()
-            data = processor.process_file(filepath)
-            
-            if data:
-                # Generate timestamp for unique filenames
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Records only count as seen once their report has been written
+            with self.processor.dedup_transaction() as dedup:
+                # Process with OCR (shared processor so duplicates are caught across runs)
+                data = self.processor.process_file(filepath, dedup)
                 
-                # Export to Excel
-                excel_path = Path(CONFIG['OUTPUT_FOLDER']) / f"udder_hygiene_{timestamp}.xlsx"
-                DataExporter.to_excel(data, excel_path)
-                
-                # Move processed file to archive
-                archive_path = Path(CONFIG['PROCESSED_FOLDER']) / Path(filepath).name
-                shutil.move(filepath, archive_path)
-                
-                logger.info(f"Successfully processed {filepath}")
-                
-                # Send notification
-                self.send_notification(Path(filepath).name, len(data), excel_path)
-            else:
-                # No data extracted, move to error folder
-                error_path = Path(CONFIG['ERROR_FOLDER']) / Path(filepath).name
-                shutil.move(filepath, error_path)
-                logger.warning(f"No data extracted from {filepath}")
+                if data:
+                    # Generate timestamp for unique filenames
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    
+                    # Export to Excel
+                    excel_path = Path(CONFIG['OUTPUT_FOLDER']) / f"udder_hygiene_{timestamp}.xlsx"
+                    DataExporter.to_excel(data, excel_path)
+                    
+                    # Move processed file to archive
+                    archive_path = Path(CONFIG['PROCESSED_FOLDER']) / Path(filepath).name
+                    shutil.move(filepath, archive_path)
+                    
+                    logger.info(f"Successfully processed {filepath}")
+                    
+                    # Send notification
+                    self.send_notification(Path(filepath).name, len(data), excel_path)
+                elif data.duplicates:
+                    # Every record was already extracted from another copy of this sheet
+                    archive_path = Path(CONFIG['PROCESSED_FOLDER']) / Path(filepath).name
+                    shutil.move(filepath, archive_path)
+                    logger.info(f"Skipped duplicate sheet {filepath}")
+                else:
+                    # No data extracted, move to error folder
+                    error_path = Path(CONFIG['ERROR_FOLDER']) / Path(filepath).name
+                    shutil.move(filepath, error_path)
+                    logger.warning(f"No data extracted from {filepath}")
                 
         except Exception as e:
             logger.error(f"Error processing {filepath}: {str(e)}")
@@ -122,9 +130,13 @@ class AutomationPipeline:
     """Main automation pipeline"""
     
     def __init__(self):
-        self.ocr_processor = UdderHygieneOCR()
-        self.exporter = DataExporter()
         self.ensure_folders_exist()
+        self.deduplicator = RecordDeduplicator(CONFIG['DEDUP_INDEX'])
+        self.ocr_processor = UdderHygieneOCR(
+            deduplicator=self.deduplicator,
+            format_registry=FormatRegistry(file_formats=CONFIG['FILE_FORMATS'])
+        )
+        self.exporter = DataExporter()
     
     def ensure_folders_exist(self):
         """Create necessary folders if they don't exist"""
@@ -141,18 +153,24 @@ class AutomationPipeline:
             if file_path.suffix.lower() in self.ocr_processor.supported_formats:
                 try:
                     logger.info(f"Processing {file_path.name}")
-                    data = self.ocr_processor.process_file(file_path)
-                    
-                    if data:
-                        all_data.extend(data)
-                        # Archive processed file
-                        archive_path = Path(CONFIG['PROCESSED_FOLDER']) / file_path.name
-                        shutil.move(str(file_path), str(archive_path))
-                        files_processed += 1
-                    else:
-                        # Move to error folder
-                        error_path = Path(CONFIG['ERROR_FOLDER']) / file_path.name
-                        shutil.move(str(file_path), str(error_path))
+                    with self.ocr_processor.dedup_transaction() as dedup:
+                        data = self.ocr_processor.process_file(file_path, dedup)
+                        
+                        if data:
+                            all_data.extend(data)
+                            # Archive processed file
+                            archive_path = Path(CONFIG['PROCESSED_FOLDER']) / file_path.name
+                            shutil.move(str(file_path), str(archive_path))
+                            files_processed += 1
+                        elif data.duplicates:
+                            # Already extracted from another copy of this sheet
+                            archive_path = Path(CONFIG['PROCESSED_FOLDER']) / file_path.name
+                            shutil.move(str(file_path), str(archive_path))
+                            logger.info(f"Skipped duplicate sheet {file_path.name}")
+                        else:
+                            # Move to error folder
+                            error_path = Path(CONFIG['ERROR_FOLDER']) / file_path.name
+                            shutil.move(str(file_path), str(error_path))
                         
                 except Exception as e:
                     logger.error(f"Error processing {file_path.name}: {str(e)}")
@@ -180,11 +198,15 @@ class AutomationPipeline:
         # Calculate statistics
         import pandas as pd
         df = pd.DataFrame(data)
+        # 0-100 and 1-4 scores are averaged per sheet format, never together
+        formats = df['format'].fillna('group-triplet') if 'format' in df else pd.Series('group-triplet', index=df.index)
+        averages = df.groupby(formats)['average'].mean().round(2)
         
         stats = {
             'total_records': len(df),
             'files_processed': files_count,
-            'average_score': round(df['average'].mean(), 2),
+            'average_score': averages.iloc[0] if len(averages) == 1 else
+                             ', '.join(f"{name} {average}" for name, average in averages.items()),
             'groups_processed': df['group'].nunique(),
             'date_range': f"{df['date'].min()} to {df['date'].max()}"
         }
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark page hand-off to OCR worker processes
+Compares the shared-memory page ring against pickling each page array
+
+Usage:
+    python benchmark-page-transfer.py --pages 64 --workers 4
+    python benchmark-page-transfer.py --pages 16 --ocr    # include real Tesseract OCR
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import udder_hygiene_ocr as ocr_core
+
+
+def touch_page(page):
+    """Transfer-only task: read the page so the hand-off cannot be skipped"""
+    return int(page[::32, ::32].sum())
+
+
+def run(transfer, pages, args):
+    task = ocr_core._ocr_page_in_worker if args.ocr else touch_page
+    # Both transfers keep at most `slots` pages in flight
+    with ocr_core.ParallelPageOCR(workers=args.workers, transfer=transfer, slots=args.slots,
+                                  slot_bytes=max(page.nbytes for page in pages)) as parallel:
+        # Warm up the pool (and ring) so start-up cost is not measured
+        parallel.ocr_pages(pages[:args.workers], task=touch_page)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        parallel.ocr_pages(iter(pages * args.repeat), task=task)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Shared-memory segments are not Python allocations, so tracemalloc cannot see them
+        shm_bytes = parallel.slots * parallel.slot_bytes if transfer == 'shm' else 0
+
+    count = len(pages) * args.repeat
+    return {'seconds': elapsed, 'pages_per_second': count / elapsed, 'peak_mb': peak / 1e6,
+            'shm_mb': shm_bytes / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory vs pickled page transfer')
+    parser.add_argument('--pages', type=int, default=32, help='Distinct synthetic pages')
+    parser.add_argument('--repeat', type=int, default=4, help='Times each page is sent')
+    parser.add_argument('--workers', type=int, default=4, help='OCR worker processes')
+    parser.add_argument('--slots', type=int, help='Pages in flight (default: workers + 1)')
+    parser.add_argument('--width', type=int, default=2480, help='Page width in pixels (A4 at 300 DPI)')
+    parser.add_argument('--height', type=int, default=3508, help='Page height in pixels')
+    parser.add_argument('--ocr', action='store_true', help='Run Tesseract instead of a transfer-only task')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pages = [rng.integers(0, 256, (args.height, args.width), dtype=np.uint8) for _ in range(args.pages)]
+    print(f"{len(pages) * args.repeat} pages of {args.width}x{args.height} "
+          f"({pages[0].nbytes / 1e6:.1f} MB each), {args.workers} workers")
+
+    results = {transfer: run(transfer, pages, args) for transfer in ('pickle', 'shm')}
+    for transfer, result in results.items():
+        print(f"  {transfer:>6}: {result['seconds']:.2f}s, {result['pages_per_second']:.1f} pages/s, "
+              f"peak parent allocations {result['peak_mb']:.1f} MB + shared memory {result['shm_mb']:.1f} MB")
+    print(f"  speed-up: {results['pickle']['seconds'] / results['shm']['seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
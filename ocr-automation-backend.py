@@ -1,271 +1,36 @@
 import os
 import re
+import json
+import shutil
+import uuid
+import time
+import logging
 import pandas as pd
-import numpy as np
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import pytesseract
-from PIL import Image
 import cv2
-import fitz  # PyMuPDF for PDF handling
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.chart import BarChart, Reference
-import json
 from flask import Flask, request, jsonify, send_file
 from werkzeug.utils import secure_filename
-import logging
-import io
-import platform
 
-# Configure Tesseract path for Windows
-if platform.system() == 'Windows':
-    # Update this path if Tesseract is installed elsewhere
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# OCR, parsing, dedup and export live in an importable module; this file is the web app
+from udder_hygiene_ocr import UdderHygieneOCR, DataExporter, RecordDeduplicator, score_columns
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class UdderHygieneOCR:
-    """Main OCR processing class for udder hygiene documents"""
-    
-    def __init__(self):
-        self.supported_formats = ['.pdf', '.jpg', '.jpeg', '.png', '.tiff']
-        self.data_pattern = re.compile(r'(\d{1,3})\s*(?:,|\s)\s*(\d{1,3})\s*(?:,|\s)\s*(\d{1,3})')
-        self.group_pattern = re.compile(r'Group\s*([A-Z])', re.IGNORECASE)
-        self.date_pattern = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})')
-        
-    def preprocess_image(self, image_path):
-        """Preprocess image for better OCR accuracy"""
-        # Read image
-        img = cv2.imread(str(image_path))
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply thresholding to get better OCR results
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        
-        # Denoise
-        denoised = cv2.fastNlMeansDenoising(thresh)
-        
-        # Resize if too small
-        height, width = denoised.shape
-        if width < 1000:
-            scale_factor = 1000 / width
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            denoised = cv2.resize(denoised, (new_width, new_height))
-        
-        return denoised
-    
-    def pdf_to_images(self, pdf_path):
-        """Convert PDF pages to images"""
-        doc = fitz.open(pdf_path)
-        images = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))  # 300 DPI
-            img_data = pix.pil_tobytes(format="PNG")
-            images.append(Image.open(io.BytesIO(img_data)))
-        
-        doc.close()
-        return images
-    
-    def extract_text_from_image(self, image):
-        """Extract text from image using OCR"""
-        # Configure tesseract for better results
-        custom_config = r'--oem 3 --psm 6'
-        
-        try:
-            text = pytesseract.image_to_string(image, config=custom_config)
-            return text
-        except Exception as e:
-            logger.error(f"OCR error: {str(e)}")
-            return ""
-    
-    def parse_ocr_text(self, text, filename=""):
-        """Parse OCR text to extract udder hygiene data"""
-        lines = text.split('\n')
-        extracted_data = []
-        
-        # Extract farm name from filename or text
-        farm_name = self.extract_farm_name(filename, text)
-        
-        # Extract date
-        date = self.extract_date(text)
-        
-        current_group = None
-        
-        for line in lines:
-            # Check for group identifier
-            group_match = self.group_pattern.search(line)
-            if group_match:
-                current_group = f"Group {group_match.group(1).upper()}"
-            
-            # Check for score data
-            scores_match = self.data_pattern.search(line)
-            if scores_match and current_group:
-                scores = [int(scores_match.group(i)) for i in range(1, 4)]
-                
-                # Validate scores (should be between 0-100)
-                if all(0 <= score <= 100 for score in scores):
-                    record = {
-                        'date': date,
-                        'farm': farm_name,
-                        'group': current_group,
-                        'score1': scores[0],
-                        'score2': scores[1],
-                        'score3': scores[2],
-                        'total': sum(scores),
-                        'average': round(sum(scores) / 3, 1)
-                    }
-                    extracted_data.append(record)
-        
-        return extracted_data
-    
-    def extract_farm_name(self, filename, text):
-        """Extract farm name from filename or text"""
-        # Try to extract from filename first
-        if "sunnyside" in filename.lower():
-            return "Sunnyside Farm"
-        
-        # Look in text
-        if "sunnyside" in text.lower():
-            return "Sunnyside Farm"
-        
-        # Default
-        return "Unknown Farm"
-    
-    def extract_date(self, text):
-        """Extract date from text"""
-        date_match = self.date_pattern.search(text)
-        if date_match:
-            month, day, year = date_match.groups()
-            # Handle 2-digit year
-            if len(year) == 2:
-                year = "20" + year
-            return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-        
-        # Default to today's date
-        return datetime.now().strftime("%Y-%m-%d")
-    
-    def process_file(self, file_path):
-        """Process a single file and extract data"""
-        file_path = Path(file_path)
-        
-        if file_path.suffix.lower() not in self.supported_formats:
-            raise ValueError(f"Unsupported file format: {file_path.suffix}")
-        
-        all_data = []
-        
-        if file_path.suffix.lower() == '.pdf':
-            # Process PDF
-            images = self.pdf_to_images(str(file_path))
-            for img in images:
-                text = self.extract_text_from_image(img)
-                data = self.parse_ocr_text(text, file_path.name)
-                all_data.extend(data)
-        else:
-            # Process image
-            processed_img = self.preprocess_image(file_path)
-            text = self.extract_text_from_image(processed_img)
-            data = self.parse_ocr_text(text, file_path.name)
-            all_data.extend(data)
-        
-        return all_data
-    
-    def process_folder(self, folder_path):
-        """Process all supported files in a folder"""
-        folder_path = Path(folder_path)
-        all_data = []
-        
-        for file_path in folder_path.iterdir():
-            if file_path.suffix.lower() in self.supported_formats:
-                try:
-                    logger.info(f"Processing {file_path.name}")
-                    data = self.process_file(file_path)
-                    all_data.extend(data)
-                except Exception as e:
-                    logger.error(f"Error processing {file_path.name}: {str(e)}")
-        
-        return all_data
-
-
-class DataExporter:
-    """Handle data export to various formats"""
-    
-    @staticmethod
-    def to_excel(data, output_path):
-        """Export data to Excel with formatting"""
-        # Create DataFrame
-        df = pd.DataFrame(data)
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Udder Hygiene Data"
-        
-        # Add headers with formatting
-        headers = ['Date', 'Farm Name', 'Group', 'Score 1', 'Score 2', 'Score 3', 'Total', 'Average']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # Add data
-        for row_idx, record in enumerate(data, 2):
-            ws.cell(row=row_idx, column=1, value=record['date'])
-            ws.cell(row=row_idx, column=2, value=record['farm'])
-            ws.cell(row=row_idx, column=3, value=record['group'])
-            ws.cell(row=row_idx, column=4, value=record['score1'])
-            ws.cell(row=row_idx, column=5, value=record['score2'])
-            ws.cell(row=row_idx, column=6, value=record['score3'])
-            ws.cell(row=row_idx, column=7, value=record['total'])
-            ws.cell(row=row_idx, column=8, value=record['average'])
-        
-        # Add summary statistics
-        ws.cell(row=len(data)+4, column=1, value="Summary Statistics")
-        ws.cell(row=len(data)+5, column=1, value="Average Score:")
-        ws.cell(row=len(data)+5, column=2, value=f"=AVERAGE(H2:H{len(data)+1})")
-        
-        # Create chart
-        chart = BarChart()
-        chart.title = "Average Scores by Group"
-        chart.y_axis.title = "Average Score"
-        chart.x_axis.title = "Group"
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = max(len(str(cell.value or '')) for cell in column)
-            ws.column_dimensions[column[0].column_letter].width = max_length + 2
-        
-        # Save workbook
-        wb.save(output_path)
-        logger.info(f"Excel file saved to {output_path}")
-    
-    @staticmethod
-    def to_csv(data, output_path):
-        """Export data to CSV"""
-        df = pd.DataFrame(data)
-        df.to_csv(output_path, index=False)
-        logger.info(f"CSV file saved to {output_path}")
-    
-    @staticmethod
-    def to_json(data, output_path):
-        """Export data to JSON"""
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"JSON file saved to {output_path}")
-
-
 # Flask Web Application
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['UPLOAD_CHUNK_SIZE'] = 1024 * 1024  # 1MB chunks for resumable uploads
+app.config['UPLOAD_SESSION_TTL'] = 24 * 60 * 60  # Abandoned sessions are removed after a day
+app.config['UPLOAD_MAX_FILE_SIZE'] = 200 * 1024 * 1024  # Largest file a chunked upload may declare
+app.config['UPLOAD_MAX_SESSIONS'] = 50  # Active sessions; bounds disk use to sessions x max file size
+app.config['UPLOAD_OCR_WORKERS'] = 2  # Completed uploads OCR'd at once, outside the request
+app.config['UPLOAD_SESSION_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'sessions')
 
 # Enable CORS for web interface
 from flask_cors import CORS
@@ -273,9 +38,13 @@ CORS(app)
 
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['UPLOAD_SESSION_FOLDER'], exist_ok=True)
 
-ocr_processor = UdderHygieneOCR()
+deduplicator = RecordDeduplicator(os.environ.get('DEDUP_INDEX', 'dedup_index.sqlite3'))
+ocr_processor = UdderHygieneOCR(deduplicator=deduplicator)
 exporter = DataExporter()
+# OCR of a large upload outlives any request timeout, so it runs here and clients poll its status
+upload_ocr_pool = ThreadPoolExecutor(max_workers=app.config['UPLOAD_OCR_WORKERS'])
 
 @app.route('/')
 def home():
@@ -287,6 +56,10 @@ def home():
     <ul>
         <li><strong>GET /api/demo</strong> - Get demo data</li>
         <li><strong>POST /api/upload</strong> - Upload files for OCR processing</li>
+        <li><strong>POST /api/uploads</strong> - Start a resumable chunked upload</li>
+        <li><strong>GET /api/uploads/&lt;id&gt;</strong> - Chunks received so far, OCR state and result</li>
+        <li><strong>PUT /api/uploads/&lt;id&gt;/chunks/&lt;n&gt;</strong> - Upload one chunk</li>
+        <li><strong>POST /api/uploads/&lt;id&gt;/complete</strong> - Reassemble and start OCR</li>
         <li><strong>POST /api/export/excel</strong> - Export data to Excel</li>
         <li><strong>POST /api/export/csv</strong> - Export data to CSV</li>
         <li><strong>POST /api/analyze</strong> - Analyze data and get statistics</li>
@@ -295,6 +68,14 @@ def home():
     <p><a href="/api/demo">Click here to see demo data</a></p>
     '''
 
+def add_scores_array(data):
+    """Ensure data format matches what the frontend expects"""
+    for record in data:
+        # Add scores array for compatibility
+        if 'scores' not in record:
+            record['scores'] = [record[key] for key in score_columns(record)]
+    return data
+
 @app.route('/api/upload', methods=['POST'])
 def upload_files():
     """Handle file upload and OCR processing"""
@@ -303,38 +84,223 @@ def upload_files():
     
     files = request.files.getlist('files')
     all_data = []
+    duplicates = 0
+    filename = None
     
-    for file in files:
-        if file.filename == '':
-            continue
-        
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        try:
-            # Process file with OCR
-            data = ocr_processor.process_file(filepath)
-            # Ensure data format matches what the frontend expects
-            for record in data:
-                # Add scores array for compatibility
-                if 'scores' not in record:
-                    record['scores'] = [record.get('score1', 0), record.get('score2', 0), record.get('score3', 0)]
-            all_data.extend(data)
-        except Exception as e:
-            logger.error(f"Error processing {filename}: {str(e)}")
-            return jsonify({'error': f'Error processing {filename}: {str(e)}'}), 500
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(filepath):
-                os.remove(filepath)
+    try:
+        # One transaction for the batch: a failing file must not mark the
+        # records of earlier files as seen when the client gets a 500
+        with ocr_processor.dedup_transaction() as dedup:
+            for file in files:
+                if file.filename == '':
+                    continue
+                
+                filename = secure_filename(file.filename)
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                file.save(filepath)
+                
+                try:
+                    # Process file with OCR
+                    data = ocr_processor.process_file(filepath, dedup)
+                    all_data.extend(add_scores_array(data))
+                    duplicates += data.duplicates
+                finally:
+                    # Clean up uploaded file
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+    except Exception as e:
+        logger.error(f"Error processing {filename}: {str(e)}")
+        return jsonify({'error': f'Error processing {filename}: {str(e)}'}), 500
     
     return jsonify({
         'success': True,
         'data': all_data,
-        'count': len(all_data)
+        'count': len(all_data),
+        'duplicates': duplicates
     })
 
+# Resumable chunked uploads
+#
+# Each upload session lives in its own folder under UPLOAD_SESSION_FOLDER with
+# a meta.json and one file per received chunk, so chunks can arrive in
+# parallel, in any order and across gunicorn workers. Reassembly streams the
+# chunks into a single file that is handed to the OCR pipeline in the
+# background; meta.json tracks the session state:
+#   uploading -> processing -> done (with 'result') or failed (with 'error')
+
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def _session_dir(upload_id):
+    if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    path = os.path.join(app.config['UPLOAD_SESSION_FOLDER'], upload_id)
+    return path if os.path.isdir(path) else None
+
+def _load_session(upload_id):
+    session_dir = _session_dir(upload_id)
+    if session_dir is None:
+        return None, None
+    with open(os.path.join(session_dir, 'meta.json')) as f:
+        return session_dir, json.load(f)
+
+def _save_meta(session_dir, meta):
+    # Replace atomically so a concurrent reader never sees a half-written file
+    partial_path = os.path.join(session_dir, f'.meta.{uuid.uuid4().hex}.part')
+    with open(partial_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(partial_path, os.path.join(session_dir, 'meta.json'))
+
+def _received_chunks(session_dir):
+    return sorted(int(name.split('_')[1]) for name in os.listdir(session_dir) if name.startswith('chunk_'))
+
+def _is_active_session(upload_id):
+    """Finished sessions only keep their result until the TTL, so they do not count"""
+    try:
+        _, meta = _load_session(upload_id)
+    except (OSError, ValueError):
+        # Being created right now
+        return True
+    return meta is not None and meta.get('state', 'uploading') in ('uploading', 'processing')
+
+def _remove_stale_sessions():
+    """Delete sessions that have not been touched within UPLOAD_SESSION_TTL"""
+    cutoff = time.time() - app.config['UPLOAD_SESSION_TTL']
+    for entry in os.scandir(app.config['UPLOAD_SESSION_FOLDER']):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload_session():
+    """Start a resumable upload and return its id and chunk layout"""
+    payload = request.get_json(silent=True) or {}
+    filename = secure_filename(payload.get('filename', ''))
+    size = payload.get('size')
+    
+    if not filename or not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'filename and a positive size are required'}), 400
+    if Path(filename).suffix.lower() not in ocr_processor.supported_formats:
+        return jsonify({'error': f'Unsupported file format: {Path(filename).suffix}'}), 400
+    if size > app.config['UPLOAD_MAX_FILE_SIZE']:
+        return jsonify({'error': f"File exceeds the {app.config['UPLOAD_MAX_FILE_SIZE']} byte limit"}), 413
+    
+    _remove_stale_sessions()
+    active_sessions = sum(1 for entry in os.scandir(app.config['UPLOAD_SESSION_FOLDER'])
+                          if entry.is_dir() and _is_active_session(entry.name))
+    if active_sessions >= app.config['UPLOAD_MAX_SESSIONS']:
+        return jsonify({'error': 'Too many uploads in progress, try again later'}), 429
+    
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    upload_id = uuid.uuid4().hex
+    meta = {
+        'filename': filename,
+        'size': size,
+        'chunk_size': chunk_size,
+        'total_chunks': -(-size // chunk_size),
+        'state': 'uploading'
+    }
+    session_dir = os.path.join(app.config['UPLOAD_SESSION_FOLDER'], upload_id)
+    os.makedirs(session_dir)
+    _save_meta(session_dir, meta)
+    
+    return jsonify({'upload_id': upload_id, **meta}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    """Report which chunks have arrived and, once completed, the OCR state and result"""
+    session_dir, meta = _load_session(upload_id)
+    if session_dir is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    
+    return jsonify({'upload_id': upload_id, **meta, 'received': _received_chunks(session_dir)})
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """Store one chunk; re-sending a chunk simply overwrites it"""
+    session_dir, meta = _load_session(upload_id)
+    if session_dir is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    if meta.get('state', 'uploading') != 'uploading':
+        return jsonify({'error': 'Upload already completed'}), 409
+    if not 0 <= index < meta['total_chunks']:
+        return jsonify({'error': f'Chunk index out of range: {index}'}), 400
+    
+    expected = min(meta['chunk_size'], meta['size'] - index * meta['chunk_size'])
+    chunk_path = os.path.join(session_dir, f'chunk_{index:06d}')
+    partial_path = os.path.join(session_dir, f'.{index:06d}.{uuid.uuid4().hex}.part')
+    with open(partial_path, 'wb') as f:
+        shutil.copyfileobj(request.stream, f)
+    
+    # Only a complete chunk becomes visible, so an interrupted PUT is just retried
+    if os.path.getsize(partial_path) != expected:
+        os.remove(partial_path)
+        return jsonify({'error': f'Chunk {index} should be {expected} bytes'}), 400
+    os.replace(partial_path, chunk_path)
+    os.utime(session_dir)
+    
+    return jsonify({'success': True, 'index': index})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Start OCR on the finished upload; poll GET /api/uploads/<id> for the result"""
+    session_dir, meta = _load_session(upload_id)
+    if session_dir is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    if meta.get('state', 'uploading') != 'uploading':
+        # A retried or concurrent call just reports on the job already started
+        return jsonify({'upload_id': upload_id, **meta}), 202
+    
+    received = set(_received_chunks(session_dir))
+    missing = [i for i in range(meta['total_chunks']) if i not in received]
+    if missing:
+        return jsonify({'error': 'Upload incomplete', 'missing': missing}), 409
+    
+    # Exactly one call (across gunicorn workers) gets to start the job
+    try:
+        os.close(os.open(os.path.join(session_dir, 'complete.lock'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        _, meta = _load_session(upload_id)
+        return jsonify({'upload_id': upload_id, **meta}), 202
+    
+    meta['state'] = 'processing'
+    _save_meta(session_dir, meta)
+    upload_ocr_pool.submit(_process_upload, upload_id, session_dir, meta)
+    return jsonify({'upload_id': upload_id, **meta}), 202
+
+def _process_upload(upload_id, session_dir, meta):
+    """Reassemble the chunks, run OCR and record the outcome in meta.json"""
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{upload_id}_{meta['filename']}")
+    try:
+        with open(filepath, 'wb') as out:
+            for index in range(meta['total_chunks']):
+                with open(os.path.join(session_dir, f'chunk_{index:06d}'), 'rb') as chunk:
+                    shutil.copyfileobj(chunk, out)
+        
+        # Keys are committed only once the result has been stored for the client
+        with ocr_processor.dedup_transaction() as dedup:
+            data = ocr_processor.process_file(filepath, dedup)
+            meta['result'] = {
+                'success': True,
+                'filename': meta['filename'],
+                'data': add_scores_array(data),
+                'count': len(data),
+                'duplicates': data.duplicates
+            }
+            meta['state'] = 'done'
+            _save_meta(session_dir, meta)
+    except Exception as e:
+        logger.error(f"Error processing {meta['filename']}: {str(e)}")
+        meta['state'] = 'failed'
+        meta['error'] = f"Error processing {meta['filename']}: {str(e)}"
+        _save_meta(session_dir, meta)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        # The session stays (without its chunks) until UPLOAD_SESSION_TTL so clients can fetch the result
+        for index in range(meta['total_chunks']):
+            chunk_path = os.path.join(session_dir, f'chunk_{index:06d}')
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+
 @app.route('/api/export/<format>', methods=['POST'])
 def export_data(format):
     """Export data to specified format"""
@@ -379,20 +345,37 @@ def analyze_data():
         return jsonify({'error': 'No data provided'}), 400
     
     df = pd.DataFrame(data)
+    for column in ('format', 'date'):
+        if column not in df:
+            df[column] = None
+    # Records from before sheet formats carry no format and are group-triplet
+    df['format'] = df['format'].fillna('group-triplet')
+    # Sheets without a readable date are reported rather than dropped
+    df['date'] = df['date'].fillna('unknown')
+    
+    registry = ocr_processor.format_registry
+    unknown_formats = set(df['format']) - set(registry.formats)
+    if unknown_formats:
+        return jsonify({'error': f"Unknown sheet format(s): {', '.join(sorted(unknown_formats))}"}), 400
+    
+    # Scores on different scales are never averaged together
+    by_format = {}
+    for name, group in df.groupby('format'):
+        by_format[name] = {
+            'total_records': len(group),
+            'average_score': round(group['average'].mean(), 2),
+            'by_group': group.groupby('group')['average'].agg(['mean', 'min', 'max', 'count']).to_dict('index'),
+            'by_date': group.groupby('date')['average'].mean().to_dict(),
+            'score_distribution': registry[name].score_distribution(group['average'])
+        }
     
-    # Calculate statistics
     stats = {
         'total_records': len(df),
-        'average_score': round(df['average'].mean(), 2),
-        'by_group': df.groupby('group')['average'].agg(['mean', 'min', 'max', 'count']).to_dict('index'),
-        'by_date': df.groupby('date')['average'].mean().to_dict(),
-        'score_distribution': {
-            'excellent': len(df[df['average'] >= 90]),
-            'good': len(df[(df['average'] >= 80) & (df['average'] < 90)]),
-            'fair': len(df[(df['average'] >= 70) & (df['average'] < 80)]),
-            'poor': len(df[df['average'] < 70])
-        }
+        'by_format': by_format
     }
+    if len(by_format) == 1:
+        # Single-format data keeps the original top-level response for existing clients
+        stats.update(next(iter(by_format.values())))
     
     return jsonify(stats)
 
@@ -0,0 +1,30 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import udder_hygiene_ocr as ocr_core  # noqa: E402
+
+SHEET_TEXT = "Sunnyside Farm 2025-03-26\nGroup A\n85, 92, 88\nGroup B\n78, 81, 79\n"
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """Fresh app instance working in a temporary folder, with OCR stubbed out"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DEDUP_INDEX', ':memory:')
+    monkeypatch.setattr(ocr_core.pytesseract, 'image_to_string', lambda image, config='': SHEET_TEXT)
+    spec = importlib.util.spec_from_file_location('ocr_automation_backend', ROOT / 'ocr-automation-backend.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.app.config['UPLOAD_CHUNK_SIZE'] = 1024
+    yield module
+    module.upload_ocr_pool.shutdown()
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
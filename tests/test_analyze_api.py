@@ -0,0 +1,22 @@
+TRIPLET = {'date': '2025-03-26', 'farm': 'F', 'group': 'Group A', 'average': 88.3, 'format': 'group-triplet'}
+PER_COW = {'date': None, 'farm': 'F', 'group': 'All', 'cow': '1234', 'average': 1.0, 'format': 'per-cow'}
+
+
+def test_single_format_keeps_top_level_stats(client):
+    stats = client.post('/api/analyze', json={'data': [TRIPLET, {**TRIPLET, 'date': None, 'average': 72.0}]}).get_json()
+    assert stats['average_score'] == 80.15
+    assert stats['by_date'] == {'2025-03-26': 88.3, 'unknown': 72.0}
+    assert stats['score_distribution'] == {'excellent': 0, 'good': 1, 'fair': 1, 'poor': 0}
+    assert list(stats['by_format']) == ['group-triplet']
+
+
+def test_formats_are_analyzed_separately(client):
+    stats = client.post('/api/analyze', json={'data': [TRIPLET, PER_COW]}).get_json()
+    assert 'average_score' not in stats
+    assert stats['by_format']['group-triplet']['average_score'] == 88.3
+    assert stats['by_format']['per-cow']['score_distribution'] == {'clean': 1, 'acceptable': 0, 'dirty': 0}
+    assert stats['by_format']['per-cow']['by_date'] == {'unknown': 1.0}
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.post('/api/analyze', json={'data': [{**TRIPLET, 'format': 'nope'}]}).status_code == 400
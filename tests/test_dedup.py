@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import udder_hygiene_ocr as ocr_core  # noqa: E402
+
+
+def page_records():
+    return [
+        {'date': '2025-03-26', 'farm': 'Sunnyside Farm', 'group': 'Group A', 'score1': 85, 'score2': 92, 'score3': 88},
+        {'date': '2025-03-26', 'farm': 'Sunnyside Farm', 'group': 'Group B', 'score1': 78, 'score2': 81, 'score3': 79},
+    ]
+
+
+def test_committed_page_is_dropped_next_time():
+    dedup = ocr_core.RecordDeduplicator()
+    with dedup.transaction() as transaction:
+        assert len(transaction.filter_page(page_records())) == 2
+        # Staged keys already count within the same transaction
+        assert transaction.filter_page(page_records()) == []
+    assert dedup.filter_page(page_records()) == []
+
+
+def test_failed_transaction_does_not_consume_records():
+    dedup = ocr_core.RecordDeduplicator()
+    with pytest.raises(RuntimeError):
+        with dedup.transaction() as transaction:
+            transaction.filter_page(page_records())
+            raise RuntimeError("OCR failed on the next file")
+    assert len(dedup.filter_page(page_records())) == 2
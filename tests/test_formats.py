@@ -0,0 +1,93 @@
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import udder_hygiene_ocr as ocr_core  # noqa: E402
+
+TRIPLET_SHEET = """Sunnyside Farm hygiene scores 2025-03-26
+Group A
+85, 92, 88
+Group B
+78 81 79
+"""
+
+PER_COW_SHEET = """Udder hygiene 03.04.2024
+Cow Score
+1234 2
+Kuh 1235: 3
+Pen 7
+#1301 1
+"""
+
+QUARTERS_SHEET = """Udder hygiene 03.04.2024
+Cow  LF RF LR RR
+1234 1 2 1 1
+1235 2, 2, 3, 1
+"""
+
+
+@pytest.fixture
+def registry():
+    return ocr_core.FormatRegistry()
+
+
+@pytest.mark.parametrize('text, expected', [
+    (TRIPLET_SHEET, 'group-triplet'),
+    (PER_COW_SHEET, 'per-cow'),
+    (QUARTERS_SHEET, 'quarters'),
+    # A 1-4 legend is shared by both cow formats and must not tip the choice
+    ("Hygiene score 1-4\n" + QUARTERS_SHEET, 'quarters'),
+    ("", 'group-triplet'),
+])
+def test_detect(registry, text, expected):
+    assert registry.detect(text).name == expected
+
+
+def test_parse_row_checks_count_and_range(registry):
+    per_cow, quarters = registry['per-cow'], registry['quarters']
+    assert per_cow.parse_row("1234 2") == ('1234', [2])
+    assert per_cow.parse_row("1234 5") is None
+    assert quarters.parse_row("1234 1 2 3 4") == ('1234', [1, 2, 3, 4])
+    assert quarters.parse_row("1234 1 2 3") is None
+    assert registry['group-triplet'].parse_row("Group A 85, 92, 188") is None
+
+
+@pytest.mark.parametrize('name, text, expected', [
+    ('group-triplet', "Date 2025-03-26", '2025-03-26'),
+    ('group-triplet', "Date 03/26/2025", '2025-03-26'),
+    ('per-cow', "Datum 03.04.24", '2024-04-03'),
+    ('per-cow', "Datum 31.02.2024 then 01.03.2024", '2024-03-01'),
+    ('per-cow', "no date here", None),
+])
+def test_parse_date(registry, name, text, expected):
+    assert registry[name].parse_date(text) == expected
+
+
+def test_group_pattern_ignores_header_prose():
+    records = ocr_core.UdderHygieneOCR().parse_ocr_text(
+        "Group hygiene score sheet 03.04.2024\nCow Score\n1234 2\nPen 12\n1235 3\n")
+    assert [(r['group'], r['cow']) for r in records] == [('All', '1234'), ('Group 12', '1235')]
+
+
+def test_parse_quarters_sheet():
+    records = ocr_core.UdderHygieneOCR().parse_ocr_text(QUARTERS_SHEET)
+    assert [r['format'] for r in records] == ['quarters', 'quarters']
+    assert records[1]['score3'] == 3 and records[1]['average'] == 2.0
+
+
+def test_warns_when_forced_format_reads_nothing(caplog):
+    processor = ocr_core.UdderHygieneOCR(sheet_format='per-cow')
+    with caplog.at_level(logging.WARNING, logger='udder_hygiene_ocr'):
+        assert processor.parse_ocr_text(QUARTERS_SHEET, 'scan.pdf') == []
+    assert "has rows for: quarters" in caplog.text
+
+
+def test_file_pattern_pins_format():
+    registry = ocr_core.FormatRegistry(file_formats={'*-quarters.pdf': 'quarters'})
+    assert registry.select(PER_COW_SHEET, 'Hillside-Quarters.PDF').name == 'quarters'
+    assert registry.select(PER_COW_SHEET, 'hillside.pdf').name == 'per-cow'
+    with pytest.raises(ValueError):
+        ocr_core.FormatRegistry(file_formats={'*.pdf': 'nope'})
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import udder_hygiene_ocr as ocr_core  # noqa: E402
+
+
+def test_pdf_pages_stay_valid_after_iteration(tmp_path):
+    # A4 at 300 DPI: pixmaps this large are unmapped as soon as they are freed
+    pdf_path = tmp_path / 'sheet.pdf'
+    doc = fitz.open()
+    for _ in range(3):
+        page = doc.new_page()
+        page.insert_text((50, 60), "Group A 85, 92, 88")
+    doc.save(str(pdf_path))
+    doc.close()
+
+    pages = list(ocr_core.UdderHygieneOCR().iter_pages(pdf_path))
+    assert len(pages) == 3
+    for page in pages:
+        assert page.shape[0] > 3000
+        # Dark text on a white page; reading freed pixmap memory would crash or return garbage
+        assert page.min() < 128 and page.max() == 255
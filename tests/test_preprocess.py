@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import udder_hygiene_ocr as ocr_core  # noqa: E402
+
+
+def bordered_table_scan():
+    """Flat 300 DPI scan: header text above a bordered table, white margins"""
+    page = np.full((3300, 2550), 255, np.uint8)
+    cv2.putText(page, "Sunnyside Farm   Date 03/26/2025", (200, 300), cv2.FONT_HERSHEY_SIMPLEX, 3, 0, 6)
+    cv2.rectangle(page, (150, 500), (2400, 3150), 0, 8)
+    for row in range(3):
+        cv2.putText(page, f"Group {'ABC'[row]}  85, 92, 88", (250, 800 + row * 600),
+                    cv2.FONT_HERSHEY_SIMPLEX, 3, 0, 6)
+    return page
+
+
+def test_crop_keeps_header_of_bordered_table_scan():
+    page = bordered_table_scan()
+    cropped = ocr_core.UdderHygieneOCR().crop_to_paper(page)
+    assert cropped.shape == page.shape
+    # The header row above the table border survives
+    assert (cropped[200:320, 200:2000] < 128).any()
+
+
+def test_crop_flattens_paper_photographed_on_dark_background():
+    photo = np.full((4000, 3000), 70, np.uint8)
+    corners = np.array([[400, 350], [2650, 450], [2550, 3650], [350, 3550]], np.int32)
+    cv2.fillConvexPoly(photo, corners, 240)
+    cropped = ocr_core.UdderHygieneOCR().crop_to_paper(photo)
+    assert cropped.shape[0] < 3400 and cropped.shape[1] < 2400
+    # Almost nothing of the dark background is left
+    assert (cropped < 128).mean() < 0.02
+
+
+def test_small_image_is_denoised_before_upscaling(monkeypatch):
+    denoised_shapes = []
+    denoise = ocr_core.cv2.fastNlMeansDenoising
+
+    def recording_denoise(image):
+        denoised_shapes.append(image.shape)
+        return denoise(image)
+
+    monkeypatch.setattr(ocr_core.cv2, 'fastNlMeansDenoising', recording_denoise)
+    small = np.full((400, 600), 255, np.uint8)
+    cv2.putText(small, "Group A 85, 92, 88", (20, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    processed = ocr_core.UdderHygieneOCR(crop_paper=False).preprocess_image(small)
+    assert denoised_shapes == [(400, 600)]
+    assert processed.shape[1] == 1000
@@ -0,0 +1,102 @@
+import time
+
+import cv2
+import numpy as np
+
+
+def sheet_png():
+    page = np.full((800, 1200), 255, np.uint8)
+    cv2.putText(page, "Group A 85, 92, 88", (50, 400), cv2.FONT_HERSHEY_SIMPLEX, 2, 0, 4)
+    return cv2.imencode('.png', page)[1].tobytes()
+
+
+def start_upload(client, content, filename='sunnyside.png'):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': len(content)})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def put_chunk(client, session, content, index):
+    start = index * session['chunk_size']
+    return client.put(f"/api/uploads/{session['upload_id']}/chunks/{index}",
+                      data=content[start:start + session['chunk_size']])
+
+
+def wait_for_ocr(client, upload_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        session = client.get(f'/api/uploads/{upload_id}').get_json()
+        if session['state'] in ('done', 'failed'):
+            return session
+        time.sleep(0.05)
+    raise AssertionError('OCR did not finish')
+
+
+def test_create_rejects_unsupported_and_oversized_files(client, backend):
+    assert client.post('/api/uploads', json={'filename': 'notes.txt', 'size': 10}).status_code == 400
+    assert client.post('/api/uploads', json={'filename': 'scan.pdf'}).status_code == 400
+    too_big = backend.app.config['UPLOAD_MAX_FILE_SIZE'] + 1
+    assert client.post('/api/uploads', json={'filename': 'scan.pdf', 'size': too_big}).status_code == 413
+
+
+def test_chunks_out_of_order_then_complete(client):
+    content = sheet_png()
+    session = start_upload(client, content)
+    assert session['total_chunks'] > 2
+
+    for index in reversed(range(session['total_chunks'])):
+        assert put_chunk(client, session, content, index).status_code == 200
+    received = client.get(f"/api/uploads/{session['upload_id']}").get_json()['received']
+    assert received == list(range(session['total_chunks']))
+
+    response = client.post(f"/api/uploads/{session['upload_id']}/complete")
+    assert response.status_code == 202
+    finished = wait_for_ocr(client, session['upload_id'])
+    assert finished['state'] == 'done'
+    assert finished['result']['count'] == 2
+    assert finished['result']['data'][0]['scores'] == [85, 92, 88]
+
+
+def test_chunk_size_mismatch_and_out_of_range_are_rejected(client):
+    content = sheet_png()
+    session = start_upload(client, content)
+    url = f"/api/uploads/{session['upload_id']}/chunks"
+    assert client.put(f'{url}/0', data=b'short').status_code == 400
+    assert client.put(f"{url}/{session['total_chunks']}", data=b'x').status_code == 400
+    assert client.get(f"/api/uploads/{session['upload_id']}").get_json()['received'] == []
+
+
+def test_complete_with_missing_chunks_is_rejected(client):
+    content = sheet_png()
+    session = start_upload(client, content)
+    put_chunk(client, session, content, 0)
+    response = client.post(f"/api/uploads/{session['upload_id']}/complete")
+    assert response.status_code == 409
+    assert response.get_json()['missing'] == list(range(1, session['total_chunks']))
+
+
+def test_repeated_complete_reports_the_running_job(client):
+    content = sheet_png()
+    session = start_upload(client, content)
+    for index in range(session['total_chunks']):
+        put_chunk(client, session, content, index)
+
+    upload_id = session['upload_id']
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 202
+    retry = client.post(f'/api/uploads/{upload_id}/complete')
+    assert retry.status_code == 202
+    assert retry.get_json()['state'] in ('processing', 'done')
+    assert wait_for_ocr(client, upload_id)['result']['count'] == 2
+    # Chunks can no longer be replaced once OCR has started
+    assert put_chunk(client, session, content, 0).status_code == 409
+
+
+def test_failed_ocr_is_reported(client):
+    content = b'not an image' * 200
+    session = start_upload(client, content)
+    for index in range(session['total_chunks']):
+        put_chunk(client, session, content, index)
+    client.post(f"/api/uploads/{session['upload_id']}/complete")
+    failed = wait_for_ocr(client, session['upload_id'])
+    assert failed['state'] == 'failed'
+    assert 'Could not read image' in failed['error']
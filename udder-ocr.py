@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Udder Hygiene OCR command-line batch tool
+Backfills archived scans in parallel and streams records to CSV, NDJSON or Parquet
+
+Usage:
+    python udder-ocr.py process scans/ 2023/*.pdf --workers 8 --format ndjson --output records.ndjson
+    python udder-ocr.py process archive/ --format parquet --output archive.parquet --cache .ocr-cache
+    python udder-ocr.py process archive/ --dedup-index dedup_index.sqlite3   # skip sheets seen in earlier runs
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import udder_hygiene_ocr as ocr_core
+
+OUTPUT_FIELDS = ['source_file', 'date', 'farm', 'group', 'cow', 'score1', 'score2', 'score3', 'score4',
+                 'total', 'average', 'format']
+PARQUET_BATCH_ROWS = 5000
+# Bump when the record layout or parsing changes so stale cache entries are ignored
+CACHE_SCHEMA_VERSION = 3
+
+logger = logging.getLogger('udder-ocr')
+
+_worker_processor = None
+
+
+def _init_worker(log_level, sheet_format):
+    """Create one OCR processor per worker process"""
+    global _worker_processor
+    logging.basicConfig(level=log_level)
+    _worker_processor = ocr_core.UdderHygieneOCR(sheet_format=sheet_format, strict_ocr=True)
+
+
+def cache_key(path, sheet_format):
+    """Cache entries depend on the file content, the sheet format and the record schema"""
+    return f"{ocr_core.file_sha256(path)}-{sheet_format or 'auto'}-v{CACHE_SCHEMA_VERSION}.json"
+
+
+def _process_one(path, cache_dir, sheet_format=None):
+    """Run OCR on one file, reusing cached results; returns records per page"""
+    cache_path = None
+    if cache_dir:
+        cache_path = Path(cache_dir) / cache_key(path, sheet_format)
+        if cache_path.exists():
+            with open(cache_path) as f:
+                return json.load(f), True
+
+    # OCR errors raise (strict_ocr), so a failed file never reaches the cache
+    pages = _worker_processor.process_file(path).pages
+
+    if cache_path:
+        # Write then rename so an interrupted run never leaves a truncated entry
+        partial_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(partial_path, 'w') as f:
+            json.dump(pages, f)
+        os.replace(partial_path, cache_path)
+    return pages, False
+
+
+def find_input_files(paths, supported_formats):
+    """Expand files and directory trees into a sorted list of scans"""
+    files, missing = [], []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in supported_formats))
+        elif path.is_file():
+            files.append(path)
+        else:
+            missing.append(path)
+    return files, missing
+
+
+class RecordWriter:
+    """Stream records to the chosen output format as they are produced"""
+
+    def __init__(self, fmt, output):
+        self.fmt = fmt
+        self.output = output
+        self._batch = []
+        self._parquet_writer = None
+
+        if fmt == 'parquet':
+            if output == '-':
+                raise SystemExit("error: --format parquet needs --output PATH")
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("error: --format parquet requires pyarrow (pip install pyarrow)")
+            self._pa = pa
+            self._schema = pa.schema([
+                ('source_file', pa.string()), ('date', pa.string()), ('farm', pa.string()),
+                ('group', pa.string()), ('cow', pa.string()), ('score1', pa.int64()),
+                ('score2', pa.int64()), ('score3', pa.int64()), ('score4', pa.int64()),
+                ('total', pa.int64()), ('average', pa.float64()), ('format', pa.string()),
+            ])
+            self._parquet_writer = pq.ParquetWriter(output, self._schema)
+            self._stream = None
+        else:
+            self._stream = sys.stdout if output == '-' else open(output, 'w', newline='')
+            if fmt == 'csv':
+                self._csv = csv.DictWriter(self._stream, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+                self._csv.writeheader()
+
+    def write(self, records):
+        if self.fmt == 'ndjson':
+            for record in records:
+                self._stream.write(json.dumps(record) + '\n')
+        elif self.fmt == 'csv':
+            self._csv.writerows(records)
+        else:
+            # Parquet row groups are buffered; a tiny group per file would bloat the footer
+            self._batch.extend(records)
+            if len(self._batch) >= PARQUET_BATCH_ROWS:
+                self._flush_parquet()
+            return
+        self._stream.flush()
+
+    def _flush_parquet(self):
+        if self._batch:
+            columns = {name: [r.get(name) for r in self._batch] for name in self._schema.names}
+            self._parquet_writer.write_table(self._pa.table(columns, schema=self._schema))
+            self._batch = []
+
+    def close(self):
+        if self._parquet_writer:
+            self._flush_parquet()
+            self._parquet_writer.close()
+        elif self._stream is not sys.stdout:
+            self._stream.close()
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def report_progress(done, total, failed, started):
+    """Print a one-line throughput/ETA status to stderr"""
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed else 0.0
+    eta = _format_duration((total - done) / rate) if rate else '--'
+    sys.stderr.write(f"\r[{done}/{total}] {rate:.2f} files/s, ETA {eta}, {failed} failed ")
+    sys.stderr.flush()
+
+
+def iter_results(files, args, log_level):
+    """Yield (path, (pages, from_cache), error) for each file as it finishes"""
+    global _worker_processor
+    if args.page_workers:
+        # One file at a time, its pages spread over workers through shared memory
+        _worker_processor = ocr_core.ParallelPageOCR(
+            processor=ocr_core.UdderHygieneOCR(sheet_format=args.sheet_format, strict_ocr=True),
+            workers=args.page_workers
+        )
+        try:
+            for path in files:
+                try:
+                    yield path, _process_one(str(path), args.cache, args.sheet_format), None
+                except Exception as e:
+                    yield path, None, e
+        finally:
+            _worker_processor.close()
+        return
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(log_level, args.sheet_format)) as pool:
+        futures = {pool.submit(_process_one, str(path), args.cache, args.sheet_format): path
+                   for path in files}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def process_command(args):
+    """Process every scan under the given paths and stream out the records"""
+    processor = ocr_core.UdderHygieneOCR()
+    files, missing = find_input_files(args.paths, processor.supported_formats)
+    failures = [(path, 'No such file or directory') for path in missing]
+
+    if args.cache:
+        Path(args.cache).mkdir(parents=True, exist_ok=True)
+
+    writer = RecordWriter(args.format, args.output)
+    # Dedup runs here rather than in the workers so one index sees every file, in this and earlier runs
+    deduplicator = ocr_core.RecordDeduplicator(args.dedup_index) if args.dedup_index else None
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    started = time.monotonic()
+    done = cached = record_count = duplicates = 0
+    empty = []
+
+    try:
+        for path, result, error in iter_results(files, args, log_level):
+            if error is None:
+                pages, from_cache = result
+                # Keys are committed only once the file's records have been written
+                with deduplicator.transaction() if deduplicator else nullcontext() as dedup:
+                    records = []
+                    for page in pages:
+                        unique = dedup.filter_page(page) if dedup else page
+                        duplicates += len(page) - len(unique)
+                        records.extend(unique)
+                    for record in records:
+                        record['source_file'] = str(path)
+                    writer.write(records)
+                record_count += len(records)
+                cached += from_cache
+                if not any(pages):
+                    empty.append(path)
+            else:
+                failures.append((path, str(error)))
+            done += 1
+            if not args.quiet:
+                report_progress(done, len(files), len(failures), started)
+    finally:
+        writer.close()
+        if deduplicator:
+            deduplicator.close()
+
+    elapsed = time.monotonic() - started
+    if not args.quiet and files:
+        sys.stderr.write('\n')
+    sys.stderr.write(
+        f"Processed {done} file(s) ({cached} from cache), {record_count} record(s), "
+        f"{duplicates} duplicate(s) skipped "
+        f"in {_format_duration(elapsed)}; {len(failures)} failure(s), {len(empty)} file(s) with no records\n"
+    )
+    for path, error in failures:
+        sys.stderr.write(f"  FAILED {path}: {error}\n")
+    for path in empty:
+        sys.stderr.write(f"  NO RECORDS {path}\n")
+
+    return 1 if failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='udder-ocr', description='Udder hygiene OCR batch tool')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    process = subparsers.add_parser('process', help='OCR scans and stream out the extracted records')
+    process.add_argument('paths', nargs='+', help='Files or directories (searched recursively)')
+    process.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parallel OCR processes')
+    process.add_argument('--page-workers', type=int, default=0,
+                         help='Process files one at a time, OCRing their pages in N processes (for large PDFs)')
+    process.add_argument('--format', choices=['csv', 'ndjson', 'parquet'], default='csv', help='Output format')
+    process.add_argument('--output', '-o', default='-', help="Output file ('-' for stdout, not for parquet)")
+    process.add_argument('--sheet-format', choices=sorted(ocr_core.DEFAULT_FORMAT_REGISTRY.formats),
+                         help='Score-sheet layout to assume (default: auto-detect per page)')
+    process.add_argument('--cache', metavar='DIR', help='Reuse results for files already processed')
+    process.add_argument('--dedup-index', metavar='PATH',
+                         help='SQLite index of extracted sheets; pages seen before (this or earlier runs) are skipped')
+    process.add_argument('--quiet', '-q', action='store_true', help='Hide the progress line')
+    process.add_argument('--verbose', '-v', action='store_true', help='Show OCR log messages')
+    process.set_defaults(func=process_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
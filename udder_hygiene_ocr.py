@@ -0,0 +1,981 @@
+import os
+import re
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+import pytesseract
+from PIL import Image
+import cv2
+import fitz  # PyMuPDF for PDF handling
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.chart import BarChart, Reference
+from openpyxl.utils import get_column_letter
+import json
+import hashlib
+import sqlite3
+import threading
+import logging
+import io
+import platform
+import time
+import queue
+import tempfile
+from fnmatch import fnmatch
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Configure Tesseract path for Windows
+if platform.system() == 'Windows':
+    # Update this path if Tesseract is installed elsewhere
+    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+logger = logging.getLogger(__name__)
+
+# Configure tesseract for better results
+OCR_CONFIG = r'--oem 3 --psm 6'
+
+# Score-sheet formats
+#
+# Each entry describes one sheet layout declaratively. FormatRegistry compiles
+# them once; detection only looks at the first few OCR lines, and only the
+# chosen format's patterns run against the rest of the document. A format
+# scores by how many of those lines are valid rows for it; its detect
+# patterns only break ties.
+#   detect        - layout-specific header patterns (tie-breakers)
+#   group_pattern - line naming the current group; its capture fills group_label
+#   row_pattern   - a score row; named group 'scores' (and optional 'cow')
+#   score_count   - scores per row; score_range - inclusive (low, high)
+#   score_bands   - (label, low, high) bands of the record average for statistics
+#   date_formats  - (pattern, field order) pairs, tried in order
+#   default_group - group used before any group line (None = skip such rows)
+SHEET_FORMATS = [
+    {
+        'name': 'group-triplet',
+        'description': 'Three 0-100 scores per group line',
+        'detect': [r'Group\s*[A-Z]\b', r'\d{1,3}\s*,\s*\d{1,3}\s*,\s*\d{1,3}'],
+        'group_pattern': r'Group\s*([A-Z])',
+        'group_label': 'Group {}',
+        'row_pattern': r'(?P<scores>\d{1,3}\s*(?:,|\s)\s*\d{1,3}\s*(?:,|\s)\s*\d{1,3})',
+        'score_count': 3,
+        'score_range': (0, 100),
+        # (label, lower bound inclusive, upper bound exclusive) on the record average
+        'score_bands': [('excellent', 90, None), ('good', 80, 90), ('fair', 70, 80), ('poor', None, 70)],
+        'date_formats': [(r'(\d{4})-(\d{1,2})-(\d{1,2})', 'YMD'), (r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})', 'MDY')],
+        'default_group': None,
+    },
+    {
+        'name': 'per-cow',
+        'description': 'One 1-4 hygiene score per cow',
+        # A bare Cow column or 1-4 legend is shared with quarters, so only a single-score header counts
+        'detect': [r'^\s*(?:Cow|Kuh|Vache)\s*(?:No\.?|Nr\.?|#|ID)?\s*[:|]?\s*(?:Score|Note|Wert)\s*$'],
+        # Anchored so header prose such as 'Group hygiene score' is not read as a group
+        'group_pattern': r'^\s*(?:Group|Pen|Gruppe)\s*([A-Z0-9]{1,3})\b',
+        'group_label': 'Group {}',
+        'row_pattern': r'^\s*(?:(?:Cow|Kuh|Vache)\s*)?#?(?P<cow>\d{2,6})\s*[:\-]?\s+(?P<scores>[1-4])\s*$',
+        'score_count': 1,
+        'score_range': (1, 4),
+        # Lower is cleaner on the 1-4 scale
+        'score_bands': [('clean', None, 1.5), ('acceptable', 1.5, 2.5), ('dirty', 2.5, None)],
+        'date_formats': [(r'(\d{4})-(\d{1,2})-(\d{1,2})', 'YMD'), (r'(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})', 'DMY')],
+        'default_group': 'All',
+    },
+    {
+        'name': 'quarters',
+        'description': 'Four 1-4 quarter scores (LF RF LR RR) per cow',
+        'detect': [r'\bLF\b.*\bRF\b.*\bLR\b.*\bRR\b', r'\b(?:VL|VR|HL|HR)\b.*\b(?:VL|VR|HL|HR)\b', r'\bquarters?\b'],
+        'group_pattern': r'^\s*(?:Group|Pen|Gruppe)\s*([A-Z0-9]{1,3})\b',
+        'group_label': 'Group {}',
+        'row_pattern': r'^\s*(?:(?:Cow|Kuh|Vache)\s*)?#?(?P<cow>\d{2,6})\s*[:\-]?\s+(?P<scores>[1-4](?:\s*[,\s]\s*[1-4]){3})\s*$',
+        'score_count': 4,
+        'score_range': (1, 4),
+        'score_bands': [('clean', None, 1.5), ('acceptable', 1.5, 2.5), ('dirty', 2.5, None)],
+        'date_formats': [(r'(\d{4})-(\d{1,2})-(\d{1,2})', 'YMD'), (r'(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})', 'DMY')],
+        'default_group': 'All',
+    },
+]
+
+
+class SheetFormat:
+    """A SHEET_FORMATS entry with its patterns compiled"""
+    
+    def __init__(self, spec):
+        self.name = spec['name']
+        self.description = spec.get('description', '')
+        self.detect_patterns = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in spec['detect']]
+        self.group_pattern = re.compile(spec['group_pattern'], re.IGNORECASE)
+        self.group_label = spec.get('group_label', '{}')
+        self.row_pattern = re.compile(spec['row_pattern'], re.IGNORECASE)
+        self.score_count = spec['score_count']
+        self.score_range = spec['score_range']
+        self.score_bands = spec['score_bands']
+        self.date_formats = [(re.compile(p), order) for p, order in spec['date_formats']]
+        self.default_group = spec.get('default_group')
+    
+    def detection_score(self, head_lines):
+        """(valid rows, header matches) over the first lines of a page"""
+        rows = sum(1 for line in head_lines if self.parse_row(line))
+        head = '\n'.join(head_lines)
+        return rows, sum(1 for pattern in self.detect_patterns if pattern.search(head))
+    
+    def score_distribution(self, averages):
+        """Count record averages per score band"""
+        distribution = {}
+        for label, low, high in self.score_bands:
+            in_band = averages.notna()
+            if low is not None:
+                in_band &= averages >= low
+            if high is not None:
+                in_band &= averages < high
+            distribution[label] = int(in_band.sum())
+        return distribution
+    
+    def parse_row(self, line):
+        """Return (cow, scores) for a valid score row, else None"""
+        match = self.row_pattern.search(line)
+        if not match:
+            return None
+        scores = [int(s) for s in re.findall(r'\d+', match.group('scores'))]
+        low, high = self.score_range
+        if len(scores) != self.score_count or not all(low <= score <= high for score in scores):
+            return None
+        cow = match.groupdict().get('cow')
+        return cow, scores
+    
+    def parse_date(self, text):
+        """Return the first valid date as YYYY-MM-DD, or None"""
+        for pattern, order in self.date_formats:
+            for match in pattern.finditer(text):
+                fields = dict(zip(order, match.groups()))
+                year = fields['Y']
+                # Handle 2-digit year
+                if len(year) == 2:
+                    year = "20" + year
+                try:
+                    return datetime(int(year), int(fields['M']), int(fields['D'])).strftime("%Y-%m-%d")
+                except ValueError:
+                    continue
+        return None
+
+
+class FormatRegistry:
+    """Compiled sheet formats with per-file overrides and auto-detection"""
+    
+    # Lines of OCR text inspected when auto-detecting the format
+    DETECT_LINES = 15
+    
+    def __init__(self, specs=SHEET_FORMATS, file_formats=None):
+        self.formats = {spec['name']: SheetFormat(spec) for spec in specs}
+        # The first format is the fallback when nothing is detected
+        self.default = next(iter(self.formats.values()))
+        # Filename glob -> format name, e.g. {'*-quarters.pdf': 'quarters'}; first match wins
+        self.file_formats = dict(file_formats or {})
+        unknown = set(self.file_formats.values()) - set(self.formats)
+        if unknown:
+            raise ValueError(f"Unknown sheet format(s): {', '.join(sorted(unknown))}")
+    
+    def __getitem__(self, name):
+        return self.formats[name]
+    
+    def detect(self, text):
+        """Pick the format that reads the most rows at the top of the page"""
+        head_lines = text.split('\n', self.DETECT_LINES)[:self.DETECT_LINES]
+        best, best_score = self.default, (0, 0)
+        for sheet_format in self.formats.values():
+            score = sheet_format.detection_score(head_lines)
+            if score > best_score:
+                best, best_score = sheet_format, score
+        return best
+    
+    def select(self, text, filename=''):
+        """Format pinned for the filename if configured, otherwise auto-detect"""
+        for pattern, name in self.file_formats.items():
+            if fnmatch(filename.lower(), pattern.lower()):
+                return self.formats[name]
+        return self.detect(text)
+
+
+DEFAULT_FORMAT_REGISTRY = FormatRegistry()
+
+class OCRError(RuntimeError):
+    """Tesseract failed on a page (raised only when strict_ocr is set)"""
+
+
+class ExtractionResult(list):
+    """Records extracted from one file, plus how many were dropped as duplicates.
+    
+    pages holds the same records split per page, for callers that
+    deduplicate later (dedup works on whole pages).
+    """
+    
+    def __init__(self, records=(), duplicates=0, pages=None):
+        super().__init__(records)
+        self.duplicates = duplicates
+        self.pages = pages if pages is not None else []
+    
+    def __reduce__(self):
+        return (ExtractionResult, (list(self), self.duplicates, self.pages))
+
+
+class UdderHygieneOCR:
+    """Main OCR processing class for udder hygiene documents"""
+    
+    # Median glyph height (px) Tesseract reads most reliably
+    TARGET_TEXT_HEIGHT = 32
+    # Fallback cap on the long side when text height cannot be estimated
+    MAX_LONG_SIDE = 3500
+    # Minimum gray-level gap between paper and background before cropping
+    PAPER_CONTRAST = 40
+    # Resolution PDF pages are rendered at
+    PDF_DPI = 300
+    
+    def __init__(self, deduplicator=None, crop_paper=True, tile_height=None, tile_workers=4,
+                 format_registry=None, sheet_format=None, strict_ocr=False):
+        self.supported_formats = ['.pdf', '.jpg', '.jpeg', '.png', '.tiff']
+        self.deduplicator = deduplicator
+        # Raise OCRError instead of treating a failed page as empty text
+        self.strict_ocr = strict_ocr
+        self.crop_paper = crop_paper
+        # Pages taller than tile_height are OCR'd as strips in parallel (None disables)
+        self.tile_height = tile_height
+        self.tile_workers = tile_workers
+        self.format_registry = format_registry or DEFAULT_FORMAT_REGISTRY
+        # Force one format for every document instead of per-file/auto selection
+        self.sheet_format = self.format_registry[sheet_format] if sheet_format else None
+        
+    def preprocess_image(self, image_path):
+        """Preprocess image for better OCR accuracy"""
+        # Read image (callers may also pass an already-decoded array)
+        if isinstance(image_path, np.ndarray):
+            img = image_path
+        else:
+            img = cv2.imread(str(image_path))
+        if img is None:
+            raise ValueError(f"Could not read image: {image_path}")
+        
+        # Convert to grayscale
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        original_shape = gray.shape
+        
+        # Shrink oversized photos to a text size Tesseract likes before any expensive operation
+        gray = self.downscale_oversized(gray)
+        
+        # Crop to the sheet and undo camera perspective
+        if self.crop_paper:
+            gray = self.crop_to_paper(gray)
+        
+        # Apply thresholding to get better OCR results
+        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        
+        # Denoise
+        start = time.perf_counter()
+        denoised = cv2.fastNlMeansDenoising(thresh)
+        denoise_seconds = time.perf_counter() - start
+        
+        # NL-means cost is linear in pixel count, so the full-size cost is extrapolated
+        pixel_ratio = (original_shape[0] * original_shape[1]) / denoised.size
+        if pixel_ratio > 1:
+            logger.info(
+                f"Preprocessed {original_shape[1]}x{original_shape[0]} -> "
+                f"{denoised.shape[1]}x{denoised.shape[0]}: "
+                f"{(original_shape[0] * original_shape[1] - denoised.nbytes) / 1e6:.1f} MB and "
+                f"~{denoise_seconds * (pixel_ratio - 1):.1f}s saved per image"
+            )
+        
+        # Resize if too small (after denoising, which costs per pixel)
+        height, width = denoised.shape
+        if width < 1000:
+            scale_factor = 1000 / width
+            denoised = cv2.resize(denoised, (int(width * scale_factor), int(height * scale_factor)))
+        
+        return denoised
+    
+    def estimate_text_height(self, gray):
+        """Estimate median glyph height in pixels, or None if no text is found"""
+        # Work on a small copy; the estimate is scaled back to full resolution
+        probe_scale = min(1.0, 1500 / max(gray.shape))
+        probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+        ink = cv2.threshold(probe, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+        _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        # Keep glyph-shaped blobs: not specks, rules or page borders
+        glyphs = heights[(heights >= 4) & (heights <= probe.shape[0] / 10) & (widths <= heights * 3)]
+        if len(glyphs) < 20:
+            return None
+        return float(np.median(glyphs)) / probe_scale
+    
+    def downscale_oversized(self, gray):
+        """Downscale oversized photos to the target text height"""
+        height, width = gray.shape
+        text_height = self.estimate_text_height(gray)
+        if text_height:
+            scale = self.TARGET_TEXT_HEIGHT / text_height
+        else:
+            scale = min(1.0, self.MAX_LONG_SIDE / max(height, width))
+        
+        if scale < 1.0 and width > 1000:
+            # Never shrink below the minimum width the upscale path guarantees
+            scale = max(scale, 1000 / width)
+            return cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        
+        return gray
+    
+    def crop_to_paper(self, gray):
+        """Find the sheet outline and warp it to a flat, axis-aligned page"""
+        probe_scale = min(1.0, 800 / max(gray.shape))
+        probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA)
+        edges = cv2.Canny(cv2.GaussianBlur(probe, (5, 5), 0), 50, 150)
+        edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+            # Ignore outlines that cover too little of the frame to be the sheet
+            if cv2.contourArea(contour) < 0.4 * probe.size:
+                break
+            approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+            if len(approx) == 4 and self._is_paper_outline(probe, approx.reshape(4, 2)):
+                corners = approx.reshape(4, 2).astype(np.float32) / probe_scale
+                return self._warp_quad(gray, corners)
+        
+        return gray
+    
+    def _is_paper_outline(self, probe, corners):
+        """True if the quad is bright paper on a darker background.
+        
+        Flat scans have no background, and the biggest outline on them is
+        usually the table border; cropping to it would cut off the header
+        with the farm name and date.
+        """
+        height, width = probe.shape
+        margin = 0.02 * min(height, width)
+        xs, ys = corners[:, 0], corners[:, 1]
+        if xs.min() < margin or ys.min() < margin or xs.max() > width - margin or ys.max() > height - margin:
+            return False
+        
+        mask = np.zeros(probe.shape, np.uint8)
+        cv2.fillConvexPoly(mask, corners.astype(np.int32), 255)
+        inside, outside = probe[mask > 0], probe[mask == 0]
+        if outside.size < 0.02 * probe.size:
+            return False
+        return np.median(outside) < np.median(inside) - self.PAPER_CONTRAST
+    
+    @staticmethod
+    def _warp_quad(image, corners):
+        """Perspective-correct the quadrilateral given by four corner points"""
+        # Order corners: top-left, top-right, bottom-right, bottom-left
+        sums = corners.sum(axis=1)
+        diffs = np.diff(corners, axis=1).ravel()
+        ordered = np.array([
+            corners[np.argmin(sums)], corners[np.argmin(diffs)],
+            corners[np.argmax(sums)], corners[np.argmax(diffs)],
+        ], dtype=np.float32)
+        
+        top_left, top_right, bottom_right, bottom_left = ordered
+        width = int(max(np.linalg.norm(top_right - top_left), np.linalg.norm(bottom_right - bottom_left)))
+        height = int(max(np.linalg.norm(bottom_left - top_left), np.linalg.norm(bottom_right - top_right)))
+        target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+        
+        matrix = cv2.getPerspectiveTransform(ordered, target)
+        return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_AREA)
+    
+    def split_into_tiles(self, image):
+        """Split a tall page into horizontal strips, cutting through blank rows"""
+        gray = np.asarray(image.convert('L')) if isinstance(image, Image.Image) else image
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        height = gray.shape[0]
+        # Rows with the least ink near each boundary are gaps between text lines
+        ink_per_row = (255 - gray).sum(axis=1)
+        window = max(1, self.tile_height // 10)
+        
+        cuts = [0]
+        while height - cuts[-1] > self.tile_height:
+            target = cuts[-1] + self.tile_height
+            lo, hi = target - window, min(height, target + window)
+            cuts.append(lo + int(np.argmin(ink_per_row[lo:hi])))
+        cuts.append(height)
+        
+        return [gray[top:bottom] for top, bottom in zip(cuts, cuts[1:])]
+    
+    def ocr_page(self, image):
+        """OCR a page, fanning very tall pages out as strips"""
+        height = image.height if isinstance(image, Image.Image) else image.shape[0]
+        if not self.tile_height or height <= self.tile_height:
+            return self.extract_text_from_image(image)
+        
+        # Tesseract runs as a subprocess, so threads give real parallelism
+        tiles = self.split_into_tiles(image)
+        with ThreadPoolExecutor(max_workers=self.tile_workers) as pool:
+            texts = list(pool.map(self.extract_text_from_image, tiles))
+        return '\n'.join(texts)
+    
+    def pdf_to_images(self, pdf_path):
+        """Convert PDF pages to images"""
+        doc = fitz.open(pdf_path)
+        images = []
+        
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))  # 300 DPI
+            img_data = pix.pil_tobytes(format="PNG")
+            images.append(Image.open(io.BytesIO(img_data)))
+        
+        doc.close()
+        return images
+    
+    def extract_text_from_image(self, image):
+        """Extract text from image using OCR"""
+        try:
+            text = pytesseract.image_to_string(image, config=OCR_CONFIG)
+            return text
+        except Exception as e:
+            if self.strict_ocr:
+                raise OCRError(f"OCR failed: {str(e)}") from e
+            logger.error(f"OCR error: {str(e)}")
+            return ""
+    
+    def parse_ocr_text(self, text, filename=""):
+        """Parse OCR text to extract udder hygiene data"""
+        lines = text.split('\n')
+        extracted_data = []
+        
+        # Extract farm name from filename or text
+        farm_name = self.extract_farm_name(filename, text)
+        
+        # Pick the sheet layout once; only its patterns run over the document
+        sheet_format = self.sheet_format or self.format_registry.select(text, filename)
+        
+        # Extract date
+        date = self.extract_date(text, sheet_format)
+        
+        current_group = sheet_format.default_group
+        seen = set()
+        
+        for line in lines:
+            # Check for group identifier
+            group_match = sheet_format.group_pattern.search(line)
+            if group_match:
+                current_group = sheet_format.group_label.format(group_match.group(1).upper())
+            
+            # Check for score data (validated against the format's score range)
+            row = sheet_format.parse_row(line)
+            if row and current_group:
+                cow, scores = row
+                # Skip score lines that were OCR'd twice for the same group
+                key = (current_group, cow, tuple(scores))
+                if key in seen:
+                    continue
+                seen.add(key)
+                record = {
+                    'date': date,
+                    'farm': farm_name,
+                    'group': current_group,
+                }
+                if cow is not None:
+                    record['cow'] = cow
+                for i, score in enumerate(scores, 1):
+                    record[f'score{i}'] = score
+                record.update({
+                    'total': sum(scores),
+                    'average': round(sum(scores) / len(scores), 1),
+                    'format': sheet_format.name
+                })
+                extracted_data.append(record)
+        
+        if not extracted_data:
+            # Only worth checking on an empty page: a wrong format loses every row
+            readable = [f.name for f in self.format_registry.formats.values()
+                        if f is not sheet_format and any(f.parse_row(line) for line in lines)]
+            if readable:
+                logger.warning(f"No rows read as {sheet_format.name} from {filename or 'page'}, "
+                               f"but the page has rows for: {', '.join(readable)}")
+        
+        return extracted_data
+    
+    def extract_farm_name(self, filename, text):
+        """Extract farm name from filename or text"""
+        # Try to extract from filename first
+        if "sunnyside" in filename.lower():
+            return "Sunnyside Farm"
+        
+        # Look in text
+        if "sunnyside" in text.lower():
+            return "Sunnyside Farm"
+        
+        # Default
+        return "Unknown Farm"
+    
+    def extract_date(self, text, sheet_format=None):
+        """Extract date from text, or None if the sheet has no readable date"""
+        sheet_format = sheet_format or self.sheet_format or self.format_registry.default
+        date = sheet_format.parse_date(text)
+        if date is None:
+            logger.warning(f"No date found for sheet format {sheet_format.name}; leaving date empty")
+        return date
+    
+    def ocr_settings(self):
+        """Settings a worker process needs to OCR pages exactly like this processor"""
+        return {
+            'tile_height': self.tile_height,
+            'tile_workers': self.tile_workers,
+            'strict_ocr': self.strict_ocr,
+        }
+    
+    def iter_pages(self, file_path):
+        """Yield the page images of a file, ready for ocr_page (each an independent array)"""
+        file_path = Path(file_path)
+        if file_path.suffix.lower() not in self.supported_formats:
+            raise ValueError(f"Unsupported file format: {file_path.suffix}")
+        return self._render_pages(file_path)
+    
+    def _render_pages(self, file_path):
+        if file_path.suffix.lower() == '.pdf':
+            doc = fitz.open(str(file_path))
+            try:
+                for page in doc:
+                    # Render straight to grayscale, skipping the PNG round trip
+                    pix = page.get_pixmap(matrix=fitz.Matrix(self.PDF_DPI / 72, self.PDF_DPI / 72),
+                                          colorspace=fitz.csGRAY, alpha=False)
+                    # pix.samples is a copy, so the page stays valid after the pixmap is freed
+                    yield np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+            finally:
+                doc.close()
+        else:
+            yield self.preprocess_image(file_path)
+    
+    def extract_page(self, text, filename, result, dedup=None):
+        """Parse one page's OCR text and add its new records to result"""
+        data = self.parse_ocr_text(text, filename)
+        if dedup:
+            data = self._drop_duplicates(data, result, dedup)
+        result.extend(data)
+        result.pages.append(data)
+    
+    def dedup_transaction(self):
+        """Transaction for the deduplicator (a no-op context without one)"""
+        return self.deduplicator.transaction() if self.deduplicator else nullcontext()
+    
+    def process_file(self, file_path, dedup=None):
+        """Process a single file and extract data.
+        
+        Duplicate keys are staged in dedup (a DedupTransaction) when given, so
+        the caller decides when they are committed; otherwise the file gets
+        its own transaction, committed only if the whole file succeeds.
+        """
+        if dedup is None and self.deduplicator:
+            with self.dedup_transaction() as dedup:
+                return self.process_file(file_path, dedup)
+        
+        file_path = Path(file_path)
+        result = ExtractionResult()
+        for page in self.iter_pages(file_path):
+            self.extract_page(self.ocr_page(page), file_path.name, result, dedup)
+        return result
+    
+    def _drop_duplicates(self, records, result, dedup):
+        """Filter records already extracted from this page (or an identical copy)"""
+        unique = dedup.filter_page(records)
+        skipped = len(records) - len(unique)
+        if skipped:
+            logger.info(f"Skipped {skipped} duplicate record(s)")
+        result.duplicates += skipped
+        return unique
+    
+    def process_folder(self, folder_path):
+        """Process all supported files in a folder"""
+        folder_path = Path(folder_path)
+        all_data = []
+        
+        for file_path in folder_path.iterdir():
+            if file_path.suffix.lower() in self.supported_formats:
+                try:
+                    logger.info(f"Processing {file_path.name}")
+                    data = self.process_file(file_path)
+                    all_data.extend(data)
+                except Exception as e:
+                    logger.error(f"Error processing {file_path.name}: {str(e)}")
+        
+        return all_data
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Hash file contents in chunks so large scans are never fully loaded"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def score_columns(record):
+    """score1..scoreN keys present in a record, in order"""
+    keys = []
+    while f'score{len(keys) + 1}' in record:
+        keys.append(f'score{len(keys) + 1}')
+    return keys
+
+
+class RecordDeduplicator:
+    """Drop records that were already extracted from the same sheet.
+    
+    A page's source id is a fingerprint of everything extracted from it
+    (farm, date and every row), so it does not depend on how the page
+    arrived: a re-upload, an emailed copy or a re-scan whose OCR reads the
+    same values all resolve to the same source, while two sheets printed
+    from the same template differ in date or scores and stay distinct.
+    Records are keyed on (farm, date, group, cow, scores, source id).
+    
+    What this guarantees: a page whose extracted records exactly match a
+    page seen before adds nothing, and the same values on different sheets
+    are never merged. A re-scan that OCRs even one value differently is
+    treated as a new sheet and all of its records are kept.
+    
+    Keys live in an indexed SQLite table, so lookups stay constant-time as
+    history grows. They are written through a DedupTransaction, so records
+    only count as seen once the caller has actually delivered them.
+    """
+    
+    def __init__(self, index_path=':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(index_path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                record_key TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+    
+    @staticmethod
+    def _record_parts(record):
+        scores = record.get('scores') or [record[key] for key in score_columns(record)]
+        cow = [record['cow']] if 'cow' in record else []
+        return [record.get('farm'), record.get('date'), record.get('group'), *cow, *scores]
+    
+    @classmethod
+    def page_fingerprint(cls, records):
+        """Source id for a page, derived from the values extracted from it"""
+        rows = sorted('|'.join(str(p) for p in cls._record_parts(record)) for record in records)
+        return hashlib.sha256('\n'.join(rows).encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def record_key(cls, record, source_id):
+        """Stable key for a record extracted from a given source"""
+        parts = [*cls._record_parts(record), source_id]
+        return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    
+    def contains(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM records WHERE record_key = ?", (key,)).fetchone() is not None
+    
+    def add_keys(self, keys):
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO records (record_key) VALUES (?)", ((k,) for k in keys))
+            self._conn.commit()
+    
+    def transaction(self):
+        """Stage keys for one file or batch; see DedupTransaction"""
+        return DedupTransaction(self)
+    
+    def filter_page(self, records):
+        """Drop the records of a page that was already processed, remembering the rest"""
+        with self.transaction() as dedup:
+            return dedup.filter_page(records)
+    
+    def close(self):
+        self._conn.close()
+
+
+class DedupTransaction:
+    """Duplicate checks whose keys are written only on commit.
+    
+    Used as a context manager: keys are committed when the block exits
+    normally and discarded if it raises, so a failed file or request never
+    marks records as seen that the caller did not receive.
+    """
+    
+    def __init__(self, deduplicator):
+        self.deduplicator = deduplicator
+        self._keys = set()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+    
+    def filter_page(self, records):
+        """Return the records of a page not already seen, staging their keys"""
+        if not records:
+            return records
+        source_id = self.deduplicator.page_fingerprint(records)
+        unique = []
+        for record in records:
+            key = self.deduplicator.record_key(record, source_id)
+            if key in self._keys or self.deduplicator.contains(key):
+                continue
+            self._keys.add(key)
+            unique.append(record)
+        return unique
+    
+    def commit(self):
+        self.deduplicator.add_keys(self._keys)
+        self._keys = set()
+    
+    def rollback(self):
+        self._keys = set()
+
+
+# Shared-memory page hand-off for parallel OCR
+#
+# Pickling a 300 DPI page (~9 MB) into a worker costs about as much as the OCR
+# itself. Pages are instead copied into a fixed ring of shared-memory slots and
+# workers receive only a small descriptor. Slots are reused, so steady-state
+# processing makes no per-page large allocations beyond the rasterizer's own.
+
+# Worker-side cache of attached segments, keyed on segment name
+_attached_segments = {}
+
+
+def _open_page(payload):
+    """Turn a page payload received by a worker into an array"""
+    if isinstance(payload, np.ndarray):
+        return payload
+    shape, dtype = tuple(payload['shape']), np.dtype(payload['dtype'])
+    if 'path' in payload:
+        return np.memmap(payload['path'], dtype=dtype, mode='r', shape=shape)
+    segment = _attached_segments.get(payload['name'])
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=payload['name'])
+        _attached_segments[payload['name']] = segment
+    return np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+
+# Worker-side processor, built from the parent processor's ocr_settings()
+_page_worker = None
+
+
+def _init_page_worker(settings):
+    global _page_worker
+    _page_worker = UdderHygieneOCR(**settings)
+
+
+def _ocr_page_in_worker(page):
+    """Default page task: OCR with the same settings as the parent processor"""
+    return _page_worker.ocr_page(page)
+
+
+def _run_page_task(payload, task):
+    return task(_open_page(payload))
+
+
+class SharedPageRing:
+    """Fixed set of reusable shared-memory page buffers"""
+    
+    def __init__(self, slots, slot_bytes, spill_dir=None):
+        self.slot_bytes = slot_bytes
+        self.spill_dir = spill_dir
+        self._segments = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+    
+    def stage(self, page):
+        """Copy a page into a free slot (blocking until one is released).
+        
+        Returns the descriptor to send to a worker and a callback that frees
+        the slot. Pages larger than a slot spill to a memory-mapped file.
+        """
+        page = np.asarray(page)
+        descriptor = {'shape': page.shape, 'dtype': page.dtype.str}
+        
+        if page.nbytes > self.slot_bytes:
+            fd, path = tempfile.mkstemp(suffix='.page', dir=self.spill_dir)
+            os.close(fd)
+            spill = np.memmap(path, dtype=page.dtype, mode='w+', shape=page.shape)
+            spill[...] = page
+            spill.flush()
+            del spill
+            return {**descriptor, 'path': path}, lambda: os.remove(path)
+        
+        slot = self._free.get()
+        segment = self._segments[slot]
+        np.copyto(np.ndarray(page.shape, dtype=page.dtype, buffer=segment.buf), page)
+        return {**descriptor, 'name': segment.name}, lambda: self._free.put(slot)
+    
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+
+class ParallelPageOCR:
+    """OCR pages of a document in worker processes.
+    
+    With transfer='shm' pages travel through a SharedPageRing; 'pickle' sends
+    the arrays themselves and is kept as the baseline for benchmarking.
+    """
+    
+    # Fits a grayscale A4/Letter page rendered at 300 DPI
+    DEFAULT_SLOT_BYTES = 10 * 1024 * 1024
+    
+    def __init__(self, processor=None, workers=None, transfer='shm', slots=None,
+                 slot_bytes=DEFAULT_SLOT_BYTES, spill_dir=None):
+        if transfer not in ('shm', 'pickle'):
+            raise ValueError(f"Unknown page transfer: {transfer}")
+        self.processor = processor or UdderHygieneOCR()
+        self.workers = workers or os.cpu_count() or 1
+        self.transfer = transfer
+        # One page in flight per worker plus one being staged
+        self.slots = slots or self.workers + 1
+        self.slot_bytes = slot_bytes
+        self.spill_dir = spill_dir
+        self._pool = None
+        self._ring = None
+    
+    @property
+    def supported_formats(self):
+        return self.processor.supported_formats
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        # Workers must be gone before the segments they attached are unlinked
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+        if self._ring:
+            self._ring.close()
+            self._ring = None
+    
+    def ocr_pages(self, pages, task=_ocr_page_in_worker):
+        """Run task on every page in worker processes, returning results in order"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_page_worker,
+                                             initargs=(self.processor.ocr_settings(),))
+        if self.transfer == 'shm' and self._ring is None:
+            self._ring = SharedPageRing(self.slots, self.slot_bytes, self.spill_dir)
+        
+        # The pickle baseline gets the same in-flight bound as the ring
+        in_flight = threading.BoundedSemaphore(self.slots) if self.transfer == 'pickle' else None
+        
+        futures = []
+        for page in pages:
+            if self.transfer == 'pickle':
+                in_flight.acquire()
+                future = self._pool.submit(_run_page_task, page, task)
+                future.add_done_callback(lambda _future: in_flight.release())
+                futures.append(future)
+                continue
+            descriptor, release = self._ring.stage(page)
+            future = self._pool.submit(_run_page_task, descriptor, task)
+            future.add_done_callback(lambda _future, release=release: release())
+            futures.append(future)
+        
+        return [future.result() for future in futures]
+    
+    def process_file(self, file_path, dedup=None):
+        """Same result as UdderHygieneOCR.process_file, with pages OCR'd in parallel"""
+        if dedup is None and self.processor.deduplicator:
+            with self.processor.dedup_transaction() as dedup:
+                return self.process_file(file_path, dedup)
+        
+        file_path = Path(file_path)
+        result = ExtractionResult()
+        for text in self.ocr_pages(self.processor.iter_pages(file_path)):
+            self.processor.extract_page(text, file_path.name, result, dedup)
+        return result
+
+
+class DataExporter:
+    """Handle data export to various formats"""
+    
+    @staticmethod
+    def to_excel(data, output_path):
+        """Export data to Excel with formatting"""
+        # Create DataFrame
+        df = pd.DataFrame(data)
+        
+        # Create workbook
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Udder Hygiene Data"
+        
+        # Columns depend on the sheet formats present (cow ids, 1-4 score columns)
+        score_count = max((len(score_columns(record)) for record in data), default=3)
+        columns = [('Date', 'date'), ('Farm Name', 'farm'), ('Group', 'group')]
+        if any('cow' in record for record in data):
+            columns.append(('Cow', 'cow'))
+        columns += [(f'Score {i}', f'score{i}') for i in range(1, score_count + 1)]
+        columns += [('Total', 'total'), ('Average', 'average')]
+        # Records from before sheet formats carry no format and are 0-100 sheets
+        default_format = DEFAULT_FORMAT_REGISTRY.default.name
+        formats = sorted({record.get('format') or default_format for record in data})
+        if len(formats) > 1:
+            columns.append(('Format', 'format'))
+        
+        # Add headers with formatting
+        for col, (header, _) in enumerate(columns, 1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center")
+        
+        # Add data
+        for row_idx, record in enumerate(data, 2):
+            for col, (_, key) in enumerate(columns, 1):
+                value = (record.get(key) or default_format) if key == 'format' else record.get(key)
+                ws.cell(row=row_idx, column=col, value=value)
+        
+        # Add summary statistics
+        average_range = "{0}2:{0}{1}".format(get_column_letter(columns.index(('Average', 'average')) + 1), len(data) + 1)
+        ws.cell(row=len(data)+4, column=1, value="Summary Statistics")
+        if len(formats) == 1:
+            ws.cell(row=len(data)+5, column=1, value="Average Score:")
+            ws.cell(row=len(data)+5, column=2, value=f"=AVERAGE({average_range})")
+        else:
+            # Scores on different scales are never averaged together
+            format_range = "{0}2:{0}{1}".format(get_column_letter(len(columns)), len(data) + 1)
+            for offset, name in enumerate(formats):
+                ws.cell(row=len(data)+5+offset, column=1, value=f"Average Score ({name}):")
+                ws.cell(row=len(data)+5+offset, column=2, value=f'=AVERAGEIF({format_range},"{name}",{average_range})')
+        
+        # Create chart
+        chart = BarChart()
+        chart.title = "Average Scores by Group"
+        chart.y_axis.title = "Average Score"
+        chart.x_axis.title = "Group"
+        
+        # Auto-adjust column widths
+        for column in ws.columns:
+            max_length = max(len(str(cell.value or '')) for cell in column)
+            ws.column_dimensions[column[0].column_letter].width = max_length + 2
+        
+        # Save workbook
+        wb.save(output_path)
+        logger.info(f"Excel file saved to {output_path}")
+    
+    @staticmethod
+    def to_csv(data, output_path):
+        """Export data to CSV"""
+        df = pd.DataFrame(data)
+        df.to_csv(output_path, index=False)
+        logger.info(f"CSV file saved to {output_path}")
+    
+    @staticmethod
+    def to_json(data, output_path):
+        """Export data to JSON"""
+        with open(output_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        logger.info(f"JSON file saved to {output_path}")